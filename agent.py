@@ -2,14 +2,23 @@ import contextlib
 import io
 import logging
 import os
+import threading
 logger = logging.getLogger(__name__)
 from models import GoogleModelID, OpenRouterModelID
 from settings import Settings
 from smolagents import LiteLLMModel, CodeAgent
+from smolagents.models import ChatMessage
+from smolagents.memory import ActionStep
+from async_runtime import get_runtime
+import litellm
 from smolagents import GoogleSearchTool, VisitWebpageTool, FinalAnswerTool
 from smolagents.local_python_executor import BASE_PYTHON_TOOLS
-from tools import GetTaskFileTool, VideoUnderstandingTool, AudioUnderstandingTool
+from tools import GetTaskFileTool, VideoUnderstandingTool, AudioUnderstandingTool, SpreadsheetTool
 from tools import ChessBoardFENTool, BestChessMoveTool, ConvertChessMoveTool
+from tools import ReadBlobTool, GrepBlobTool
+from blob_store import BlobStore
+from speculative import SpeculativeDelegateTool, SpeculationStats
+from profiler import Profiler
 
 
 # Base tools may use these to process files
@@ -19,17 +28,55 @@ BASE_PYTHON_TOOLS["io"] = io
 BASE_PYTHON_TOOLS["contextlib"] = contextlib
 BASE_PYTHON_TOOLS["exec"] = exec
 
+class AsyncLiteLLMModel(LiteLLMModel):
+    """LiteLLMModel whose completions run as litellm.acompletion on the shared event loop."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.runtime = get_runtime()
+
+    def __call__(self, messages, stop_sequences=None, grammar=None, tools_to_call_from=None, **kwargs):
+        if tools_to_call_from:
+            # Tool calling agents need smolagents' own tool call parsing
+            return super().__call__(messages, stop_sequences, grammar, tools_to_call_from, **kwargs)
+        return self.runtime.run(self.acall(messages, stop_sequences, grammar, **kwargs))
+
+    async def acall(self, messages, stop_sequences=None, grammar=None, **kwargs) -> ChatMessage:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            model=self.model_id,
+            api_base=self.api_base,
+            api_key=self.api_key,
+            convert_images_to_image_urls=True,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
+        )
+        response = await litellm.acompletion(**completion_kwargs)
+        self.last_input_token_count = response.usage.prompt_tokens
+        self.last_output_token_count = response.usage.completion_tokens
+        message = ChatMessage.from_dict(
+            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"})
+        )
+        message.raw = response
+        return message
+
 class ResearchAgent:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, blob_store: BlobStore | None = None):
+        tools = [GoogleSearchTool("serper"),
+                 VisitWebpageTool(max_output_length=100000),
+                 VideoUnderstandingTool(settings, GoogleModelID.GEMINI_2_0_FLASH),
+                 AudioUnderstandingTool(settings, GoogleModelID.GEMINI_2_0_FLASH),
+                 SpreadsheetTool()
+                 ]
+        if blob_store:
+            # Large observations stay on disk, the agent reads them on demand
+            tools += [ReadBlobTool(blob_store), GrepBlobTool(blob_store)]
         self.agent = CodeAgent(
             name="researcher",
             description="Searches the web, works with files, and answers questions for you. Give it your query as an argument.",
             add_base_tools=False,
-            tools=[GoogleSearchTool("serper"),
-                   VisitWebpageTool(max_output_length=100000),
-                   VideoUnderstandingTool(settings, GoogleModelID.GEMINI_2_0_FLASH),
-                   AudioUnderstandingTool(settings, GoogleModelID.GEMINI_2_0_FLASH)
-                   ],
+            tools=tools,
             additional_authorized_imports=[
                 "unicodedata",
                 "stat",
@@ -47,12 +94,14 @@ class ResearchAgent:
             ],
             max_steps=10,
             verbosity_level=1,
-            model=LiteLLMModel(
+            model=AsyncLiteLLMModel(
                 model_id=OpenRouterModelID.GPT_O4_MINI_HIGH,
                 api_key = settings.openrouter_api_key.get_secret_value(),
                 temperature=0.0, timeout=180
             )
         )
+        if blob_store:
+            blob_store.instrument_agent(self.agent)
 
 class ChessAgent:
     def __init__(self, settings: Settings):
@@ -81,7 +130,7 @@ class ChessAgent:
             ],
             max_steps=10,
             verbosity_level=1,
-            model=LiteLLMModel(
+            model=AsyncLiteLLMModel(
                 model_id=OpenRouterModelID.GPT_O4_MINI,
                 api_key = settings.openrouter_api_key.get_secret_value(),
                 temperature=0.0, timeout=180
@@ -89,21 +138,61 @@ class ChessAgent:
         )
 
 class ManagerAgent:
-    def __init__(self, settings: Settings):
-        self.researcher = ResearchAgent(settings).agent
+    def __init__(self, settings: Settings, profiler: Profiler | None = None,
+                 blob_store: BlobStore | None = None,
+                 speculation_stats: SpeculationStats | None = None):
+        self.researcher = ResearchAgent(settings, blob_store).agent
         self.chess_player = ChessAgent(settings).agent
+        tools = [GetTaskFileTool(settings), FinalAnswerTool()]
+        if settings.speculative_execution:
+            # Opt-in, lets the manager race alternative approaches of a team member
+            agent_factories = {
+                "researcher": lambda: ResearchAgent(settings, blob_store).agent,
+                "chess_player": lambda: ChessAgent(settings).agent,
+            }
+            tools.append(SpeculativeDelegateTool(settings, agent_factories,
+                                                 speculation_stats or SpeculationStats(), profiler))
         self.agent = CodeAgent(
-            tools=[GetTaskFileTool(settings), FinalAnswerTool()],
-            model=LiteLLMModel(
+            tools=tools,
+            model=AsyncLiteLLMModel(
                 model_id=OpenRouterModelID.GPT_O4_MINI,
                 api_key = settings.openrouter_api_key.get_secret_value(),
                 temperature=0.0, timeout=180
             ),
             managed_agents=[self.researcher, self.chess_player],
         )
+        if profiler:
+            profiler.instrument_agent(self.agent)
+        # run() clears the interrupt switch, so a cancelled run re-arms it after every step
+        self._interrupted = threading.Event()
+        for agent in [self.agent, self.researcher, self.chess_player]:
+            agent.step_callbacks.append(
+                lambda step, agent: agent.interrupt() if self._interrupted.is_set() else None)
         # print("BasicAgent initialized.")
     def __call__(self, question: str) -> str:
         logger.info(f"Agent received question (first 50 chars): {question[:50]}...")
+        self._check_interrupted()
         final_answer = self.agent.run(question)
         logger.info(f"Agent returning fixed answer: {final_answer}")
-        return final_answer 
\ No newline at end of file
+        return final_answer
+
+    def step_count(self) -> int:
+        """Manager LLM steps so far, over the run and any follow ups."""
+        return sum(isinstance(step, ActionStep) for step in self.agent.memory.steps)
+
+    def follow_up(self, message: str) -> str:
+        """Continue the previous run with its memory, e.g. to fix the answer format."""
+        logger.info(f"Agent received follow up (first 50 chars): {message[:50]}...")
+        self._check_interrupted()
+        final_answer = self.agent.run(message, reset=False)
+        logger.info(f"Agent returning follow up answer: {final_answer}")
+        return final_answer 
+    def interrupt(self):
+        """Stop the manager and its team at their next step, e.g. when the job is cancelled."""
+        self._interrupted.set()
+        for agent in [self.agent, self.researcher, self.chess_player]:
+            agent.interrupt()
+
+    def _check_interrupted(self):
+        if self._interrupted.is_set():
+            raise RuntimeError("Agent interrupted.")
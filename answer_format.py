@@ -0,0 +1,185 @@
+from pydantic import BaseModel
+from typing import Optional
+import sys
+import threading
+import re
+import logging
+logger = logging.getLogger(__name__)
+
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+MAX_ANSWER_WORDS = 10
+# Question, raw agent answer, expected normalized answer, run with 'python answer_format.py'
+EXAMPLES = [
+    ("How many studio albums were published by Mercedes Sosa between 2000 and 2009 (included)?",
+     "1,234", "1234"),
+    ("Give the populations as a comma separated list. How many people live in each city?",
+     "1,234", "1234"),
+    ("Which country did the expedition depart from? Give the country name.",
+     "U.S.", "U.S."),
+    ("Where were the specimens eventually deposited? Just give me the city name without abbreviations.",
+     "Final answer: Saint Petersburg.", "Saint Petersburg"),
+    ("Examine the video. What does Teal'c say in response to the question \"Isn't that hot?\"",
+     '"Extremely, indeed."', '"Extremely, indeed."'),
+    ("What were the total sales that the chain made from food? Express your answer in USD with "
+     "two decimal places.", "$89,706", "89706.00"),
+    ("What is the value of pi? Round to three decimal places.",
+     "3.14159", "3.142"),
+    ("What percentage of the votes did she get? Give the nearest whole number.",
+     "45.6%", "46"),
+    ("Please list the vegetables, comma separated. Alphabetize the list.",
+     "sweet potatoes, Broccoli,celery.", "Broccoli, celery, sweet potatoes"),
+    ("Give the IOC country code as your answer, in upper case.",
+     "cub", "CUB"),
+]
+
+
+class AnswerFormat(BaseModel):
+    """Format requirements parsed from a question."""
+    is_list: bool = False
+    is_number: bool = False
+    sort_alphabetically: bool = False
+    decimals: Optional[int] = None
+    keep_units: bool = False
+    case: Optional[str] = None
+
+    @classmethod
+    def from_question(cls, question: str) -> "AnswerFormat":
+        text = question.lower()
+        decimals = None
+        match = re.search(r"\b(\d+|one|two|three|four|five) decimal places?", text)
+        if match:
+            value = match.group(1)
+            decimals = int(value) if value.isdigit() else NUMBER_WORDS[value]
+        elif re.search(r"nearest (whole number|integer)", text):
+            decimals = 0
+        case = None
+        if re.search(r"lower ?case", text):
+            case = "lower"
+        elif re.search(r"upper ?case|all caps|capital letters", text):
+            case = "upper"
+        return cls(
+            is_list=bool(re.search(r"comma[- ](separated|delimited)|\blist\b", text)),
+            is_number=bool(decimals is not None or re.search(
+                r"\bhow (many|much)\b|\bwhat (is the )?(number|count|total)\b|\bnumeric\b", text)),
+            sort_alphabetically=bool(re.search(r"alphabeti(c|cal|cally|ze|zed)\b", text)),
+            decimals=decimals,
+            keep_units=bool(re.search(r"\b(with|include|including) (the )?units?\b", text)),
+            case=case,
+        )
+
+    def _normalize_number(self, value: str) -> str:
+        number = value.strip()
+        if not self.keep_units:
+            number = re.sub(r"^[$€£]\s*|\s*%$", "", number)
+        # Thousands separators, e.g. 1,234,567
+        if re.fullmatch(r"-?\d{1,3}(,\d{3})+(\.\d+)?", number):
+            number = number.replace(",", "")
+        if self.decimals is not None and NUMBER_PATTERN.match(number):
+            number = f"{float(number):.{self.decimals}f}"
+        return number if NUMBER_PATTERN.match(number) or self.keep_units else value.strip()
+
+    def _normalize_item(self, item: str) -> str:
+        item = item.strip().strip("\"'`").strip()
+        # A trailing period is punctuation, unless it ends an abbreviation like "U.S."
+        if item.endswith(".") and not re.search(r"\b\w\.$", item):
+            item = item[:-1].rstrip()
+        if self.is_number:
+            item = self._normalize_number(item)
+        if self.case == "lower":
+            item = item.lower()
+        elif self.case == "upper":
+            item = item.upper()
+        return item
+
+    def normalize(self, answer: str) -> str:
+        """Deterministically fix list spacing, number formatting and case."""
+        answer = re.sub(r"^\s*(final answer)\s*:\s*", "", answer.strip(), flags=re.IGNORECASE)
+        if not self.is_list and re.fullmatch(r'(["\'`]).*\1', answer, flags=re.DOTALL):
+            # Quoted text is the answer verbatim, e.g. a sentence to repeat
+            return answer
+        # Only list questions are split, a comma in other answers is part of the text
+        if self.is_list and not (self.is_number and re.fullmatch(r"-?\d{1,3}(,\d{3})+(\.\d+)?", answer)):
+            items = [self._normalize_item(item) for item in re.split(r"[,;\n]", answer)]
+            items = [item for item in items if item]
+            if self.sort_alphabetically:
+                items = sorted(items, key=str.lower)
+            return ", ".join(items)
+        return self._normalize_item(answer)
+
+    def validate(self, answer: str) -> list[str]:
+        """Problems that cannot be fixed locally and need the agent."""
+        problems = []
+        if not answer:
+            return ["The final answer is empty."]
+        items = answer.split(", ") if self.is_list else [answer]
+        if self.is_number and not all(NUMBER_PATTERN.match(item) for item in items) \
+                and not self.keep_units:
+            problems.append("The question asks for a number, the answer must be numeric only.")
+        if not self.is_list and len(answer.split()) > MAX_ANSWER_WORDS:
+            problems.append("The answer should be a number or as few words as possible.")
+        return problems
+
+
+class FormatStats():
+    """Counts answers fixed locally and the manager LLM steps spent on answers and re-prompts."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.fixed_locally = 0
+        self.reprompted = 0
+        self.failed_validation = 0
+        self.answer_steps = 0
+        self.reprompt_steps = 0
+
+    def record(self, changed: bool, answer_steps: int, reprompt_steps: int, failed: bool):
+        with self._lock:
+            self.checked += 1
+            self.fixed_locally += int(changed)
+            self.reprompted += int(reprompt_steps > 0)
+            self.failed_validation += int(failed)
+            self.answer_steps += answer_steps
+            self.reprompt_steps += reprompt_steps
+
+    def estimated_steps_saved(self) -> Optional[float]:
+        """
+        Answers fixed locally times the measured steps per re-prompt, the cost each
+        fix would have had as an LLM round. None until a re-prompt has been measured.
+        """
+        if not self.reprompted:
+            return None
+        return self.fixed_locally * self.reprompt_steps / self.reprompted
+
+    def report(self) -> str:
+        report = (f"Answer format: {self.checked} checked, {self.fixed_locally} fixed locally, "
+                  f"{self.reprompted} re-prompted, {self.failed_validation} still invalid. "
+                  f"Measured manager steps: {self.answer_steps} to answer, "
+                  f"{self.reprompt_steps} on re-prompts.")
+        saved = self.estimated_steps_saved()
+        if saved is not None:
+            report += f" Estimated {saved:.0f} step(s) saved by local fixes."
+        return report
+
+
+def check(examples: list[tuple[str, str, str]] = EXAMPLES) -> list[str]:
+    """
+    Normalize every example answer against its question.
+
+    Returns:
+        list[str]: One message per example whose result differs from the expected answer.
+    """
+    failures = []
+    for question, answer, expected in examples:
+        normalized = AnswerFormat.from_question(question).normalize(answer)
+        if normalized != expected:
+            failures.append(f"{answer!r} -> {normalized!r}, expected {expected!r} for: {question}")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check()
+    for failure in failures:
+        print(failure)
+    print(f"{len(EXAMPLES) - len(failures)}/{len(EXAMPLES)} examples normalized as expected.")
+    sys.exit(1 if failures else 0)
@@ -5,8 +5,8 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry import trace
 from evaluator import Evaluator
 from runner import Runner
+from job_manager import JobManager
 from settings import Settings
-import time
 import os
 import pandas as pd
 import gradio as gr
@@ -16,6 +16,7 @@ logger = logging.getLogger(__name__)
 settings = Settings()
 evaluator = Evaluator(settings)
 runner = Runner(settings)
+job_manager = JobManager(settings, runner)
 
 
 # Create a TracerProvider for OpenTelemetry
@@ -43,24 +44,49 @@ def _format_elapsed_time(elapsed_time):
     else:
         return f"Elapsed time: {seconds:.2f} seconds"
     
-def _run(questions: list, username: str) -> pd.DataFrame:
-    start_time = time.time()
-    question_answer_pairs = runner.run_agent(questions, username)
-    end_time = time.time()
-    message = f"Complete. {_format_elapsed_time(end_time - start_time)}"
-    return message, question_answer_pairs
+def _run(questions: list, username: str):
+    job = job_manager.submit(username, questions)
+    # Stream progress until the job finishes, other users keep their own queues
+    while not job.done.wait(timeout=2):
+        yield job.summary(), job.partial_results()
+    if job.results is None:
+        yield f"{job.summary()}\n{job.error}", EMPTY_RESULTS_TABLE
+        return
+    message = (f"{job.status.capitalize()}. {_format_elapsed_time(job.finished_at - job.created_at)}\n"
+               f"{runner.format_stats.report()}")
+    if settings.speculative_execution:
+        message = f"{message}\n{runner.speculation_stats.report()}"
+    yield message, job.results
     
-def run_one(profile: gr.OAuthProfile | None) -> pd.DataFrame:
+def run_one(profile: gr.OAuthProfile | None):
     if profile: 
-        return _run([evaluator.get_one_question()], profile.username)
+        yield from _run([evaluator.get_one_question()], profile.username)
     else:
-        return LOGIN_MESSAGE, EMPTY_RESULTS_TABLE
+        yield LOGIN_MESSAGE, EMPTY_RESULTS_TABLE
 
-def run_all(profile: gr.OAuthProfile | None) -> pd.DataFrame:
+def run_all(profile: gr.OAuthProfile | None):
     if profile: 
-        return _run(evaluator.get_questions(), profile.username)
+        yield from _run(evaluator.get_questions(), profile.username)
     else:
-        return LOGIN_MESSAGE, EMPTY_RESULTS_TABLE
+        yield LOGIN_MESSAGE, EMPTY_RESULTS_TABLE
+
+def job_status(profile: gr.OAuthProfile | None) -> str:
+    if profile: 
+        return job_manager.status(profile.username)
+    else:
+        return LOGIN_MESSAGE
+
+def timeline(profile: gr.OAuthProfile | None) -> str:
+    if profile: 
+        return job_manager.timeline_html(profile.username)
+    else:
+        return LOGIN_MESSAGE
+
+def cancel(profile: gr.OAuthProfile | None) -> str:
+    if profile: 
+        return job_manager.cancel(profile.username)
+    else:
+        return LOGIN_MESSAGE
 
 def submit(profile: gr.OAuthProfile | None) -> str:
     if profile: 
@@ -85,6 +111,9 @@ with gr.Blocks() as demo:
         Once clicking 'Get All Answers', it can take quite some time (this is the time for the agent to go through all 20 questions).
         The agent(s) will run question tasks in parallel making the logs hard to follow. Langfuse instrumentation has been configured. 
         The 'Submit All Answers' button will use the most recent agent answers cached in the space for your username.
+        Runs are queued per user. Questions being solved, or recently solved, for another user are shared. 
+        Use 'Job Status' to see progress and 'Cancel My Jobs' to stop your queued and running jobs.
+        'Timeline' shows where your last job spent its time, queued or working, from the built-in offline profiler.
         """
     )
 
@@ -93,17 +122,32 @@ with gr.Blocks() as demo:
     run_one_button = gr.Button("Get One Answer")
     run_all_button = gr.Button("Get All Answers")
     submit_button = gr.Button("Submit Answers")
+    with gr.Row():
+        status_button = gr.Button("Job Status")
+        cancel_button = gr.Button("Cancel My Jobs")
+        timeline_button = gr.Button("Timeline")
 
     status_output = gr.Textbox(
         label="Run Status / Submission Result", lines=5, interactive=False)
     results_table = gr.DataFrame(
         label="Questions and Agent Answers", wrap=True)
+    timeline_output = gr.HTML()
 
+    # Jobs are queued by the job manager, so gradio need not serialize these
     run_one_button.click(
-        fn=run_one, outputs=[status_output, results_table]
+        fn=run_one, outputs=[status_output, results_table], concurrency_limit=None
     )
     run_all_button.click(
-        fn=run_all, outputs=[status_output, results_table]
+        fn=run_all, outputs=[status_output, results_table], concurrency_limit=None
+    )
+    status_button.click(
+        fn=job_status, outputs=[status_output]
+    )
+    timeline_button.click(
+        fn=timeline, outputs=[timeline_output]
+    )
+    cancel_button.click(
+        fn=cancel, outputs=[status_output], concurrency_limit=None
     )
     submit_button.click(
         fn=submit, outputs=[status_output]
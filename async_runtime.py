@@ -0,0 +1,73 @@
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+import asyncio
+import threading
+import httpx
+from google import genai
+import logging
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime():
+    """
+    One event loop, on one background thread, for all tool and LLM I/O.
+
+    Async callers await the coroutines directly on the loop. Synchronous callers,
+    such as smolagents tools inside an agent step, hand their coroutine to the loop
+    with run() and block their own thread until it is done, so the number of threads
+    is bounded by the callers, not removed. All HTTP shares one connection pool.
+    """
+    def __init__(self, max_connections: int = 100):
+        self.max_connections = max_connections
+        self.loop = asyncio.new_event_loop()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._genai_clients: dict[str, genai.Client] = {}
+        self._thread = threading.Thread(target=self._run_loop, name="async-io", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared HTTP client, only to be used from coroutines on the loop."""
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections // 5)
+            self._client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        return self._client
+
+    def genai_client(self, api_key: str) -> genai.Client:
+        """A shared Gemini client per api key, its aio calls only to be awaited on the loop."""
+        if api_key not in self._genai_clients:
+            self._genai_clients[api_key] = genai.Client(api_key=api_key)
+        return self._genai_clients[api_key]
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncRuntime.run() would block its own loop, await instead.")
+        return self.submit(coro).result(timeout)
+
+    def close(self):
+        if self._client is not None:
+            self.run(self._client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_runtime: Optional[AsyncRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AsyncRuntime:
+    """The process wide runtime, every agent and tool shares it."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AsyncRuntime()
+        return _runtime
@@ -0,0 +1,132 @@
+from profiler import current_task_id
+import hashlib
+import mmap
+import os
+import re
+import resource
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+
+class BlobStore():
+    """
+    Keeps large tool observations on disk instead of in agent memory.
+
+    Tools return their full output, so code the agent runs on it sees every byte.
+    Only the observation a step writes into memory is spilled once above the
+    threshold, keyed by content hash, and replaced with a short handle and preview.
+    Blobs are read back memory-mapped, so slices and greps never load the whole
+    output. Sizes and offsets are in UTF-8 bytes throughout.
+    """
+    def __init__(self, directory_name: str = "blobs", threshold: int = 8000,
+                 preview_bytes: int = 1000):
+        self.directory_name = directory_name
+        self.threshold = threshold
+        self.preview_bytes = preview_bytes
+        os.makedirs(self.directory_name, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _path(self, blob_id: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{16}", blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id}")
+        return os.path.join(self.directory_name, f"{blob_id}.txt")
+
+    def put(self, text: str) -> str:
+        """Write text to the store and return its blob id."""
+        data = text.encode("utf-8")
+        blob_id = hashlib.sha256(data).hexdigest()[:16]
+        path = self._path(blob_id)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return blob_id
+
+    def spill(self, text, source: str = "tool"):
+        """Replace a large string with a handle and preview, smaller ones are kept."""
+        if not isinstance(text, str):
+            return text
+        data = text.encode("utf-8")
+        if len(data) <= self.threshold:
+            self._record(inline=len(data))
+            return text
+        blob_id = self.put(text)
+        self._record(spilled=len(data))
+        logger.info(f"Spilled {len(data)} bytes from {source} to blob {blob_id}")
+        preview = data[:self.preview_bytes].decode("utf-8", errors="ignore")
+        return (f"[blob {blob_id}: {len(data)} bytes from {source}, preview below. "
+                f"Use read_blob(blob_id='{blob_id}', start=..., length=...) or "
+                f"grep_blob(blob_id='{blob_id}', pattern=...) to see more.]\n"
+                f"{preview}\n[... {len(data) - self.preview_bytes} more bytes]")
+
+    def read(self, blob_id: str, start: int = 0, length: int = 4000) -> str:
+        """Read a slice of a blob, start and length are byte offsets."""
+        with open(self._path(blob_id), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return data[max(start, 0):max(start, 0) + length].decode("utf-8", errors="ignore")
+
+    def grep(self, blob_id: str, pattern: str, context: int = 200, max_matches: int = 20) -> str:
+        """Regex search a blob, returning each match with surrounding context."""
+        regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+        matches = []
+        with open(self._path(blob_id), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for match in regex.finditer(data):
+                start = max(match.start() - context, 0)
+                snippet = data[start:match.end() + context].decode("utf-8", errors="ignore")
+                matches.append(f"@{match.start()}: {snippet}")
+                if len(matches) >= max_matches:
+                    break
+        if not matches:
+            return f"No matches for '{pattern}' in blob {blob_id}."
+        return "\n---\n".join(matches)
+
+    def instrument_agent(self, agent):
+        """Spill large step observations before they reach the agent's memory."""
+        agent_name = agent.name or "manager"
+        agent.step_callbacks.append(lambda step: self._on_step(step, agent_name))
+        return agent
+
+    def _on_step(self, step, agent_name: str):
+        # Callbacks run before the step is turned into messages for the next one
+        observations = getattr(step, "observations", None)
+        if observations:
+            step.observations = self.spill(observations, f"{agent_name} step "
+                                                         f"{getattr(step, 'step_number', '')}".strip())
+
+    def _record(self, inline: int = 0, spilled: int = 0):
+        task_id = current_task_id() or "-"
+        rss = _current_rss()
+        with self._lock:
+            stats = self._stats.setdefault(
+                task_id, {"inline": 0, "spilled": 0, "blobs": 0, "process_rss": 0})
+            stats["inline"] += inline
+            stats["spilled"] += spilled
+            stats["blobs"] += int(spilled > 0)
+            stats["process_rss"] = max(stats["process_rss"], rss)
+
+    def task_report(self, task_id: str) -> str:
+        """
+        Observation bytes kept in memory versus spilled for a task. RSS is that of the
+        whole process, the peak sampled at the task's steps, concurrent tasks included.
+        """
+        with self._lock:
+            stats = self._stats.get(task_id)
+        if stats is None:
+            return f"Task {task_id}: no observations."
+        return (f"Task {task_id}: observations {stats['inline'] / 1024:.0f} KB inline, "
+                f"{stats['spilled'] / 1024:.0f} KB spilled in {stats['blobs']} blob(s), "
+                f"process RSS peaked at {stats['process_rss'] / 2**20:.0f} MB during its steps")
+
+
+def _current_rss() -> int:
+    """Resident memory of the process in bytes, the peak if current is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -1,6 +1,7 @@
 from settings import Settings
 from typing import List
 from models import Question, QuestionAnswerPair, Results
+from question_store import QuestionStore
 import requests
 import random
 import json
@@ -11,51 +12,30 @@ logger = logging.getLogger(__name__)
 class Evaluator():
     def __init__(self, settings: Settings):
         self.settings = settings
+        self.store = QuestionStore(settings)
 
-    def get_questions(self) -> list[Question]:
+    def get_questions(self, level=None) -> list[Question]:
         """
-        Get the questions from the HuggingFace endpoint.
+        Get the questions from the local store, refreshed from the HuggingFace endpoint when stale.
 
         Returns:
             list[Question]: A list of Question objects
         """
-        url = str(self.settings.scoring_api_base_url) + "questions"
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            questions = [Question(**question) for question in response.json()]
-            with open("questions.json", "w") as f:
-                json.dump([question.model_dump()
-                           for question in questions], f, indent=4)
-        except:
-            # Read local file instead, dealing with rate limits, etc.
-            with open("questions.json", "r") as f:
-                questions = [Question(**question) for question in json.load(f)]
-        return questions
+        return self.store.all(level)
 
     def get_one_question(self, task_id=None) -> Question:
         """
-        Get a random, or requested question from the HuggingFace endpoint.
+        Get a random, or requested question from the local store.
 
         Returns:
             Question: A Question object
         """
         if task_id:
-            questions = self.get_questions()
-            if task_id:
-                for question in questions:
-                    if question.task_id == task_id:
-                        return question
-        try:
-            url = str(self.settings.scoring_api_base_url) + "random-question"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            question = Question(**response.json())
-            return question
-        except:
-            # Read local file instead, dealing with rate limits, etc.
-            questions = self.get_questions()
-            return questions[random.randint(0, len(questions)-1)]
+            question = self.store.get(task_id)
+            if question:
+                return question
+            logger.warning(f"Unknown task_id {task_id}, picking a random question.")
+        return random.choice(self.store.all())
 
     def _read_answer_file(self, username) -> List[str]:
         """Read the question answer pairs from a user-specific answer file."""
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import logging
+logger = logging.getLogger(__name__)
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# openpyxl formats only, legacy .xls would need xlrd
+SPREADSHEET_EXTENSIONS = (".xlsx", ".xlsm")
+# One lock per workbook hash, shared by all cache instances since agents each build their own tools
+_convert_locks: dict[str, threading.Lock] = {}
+_convert_locks_lock = threading.Lock()
+
+
+def _convert_lock(content_hash: str) -> threading.Lock:
+    with _convert_locks_lock:
+        return _convert_locks.setdefault(content_hash, threading.Lock())
+
+
+class SpreadsheetCache():
+    """
+    Converts spreadsheet attachments once into Arrow (feather) files, one per sheet.
+
+    Entries are keyed by the sha256 of the workbook content, so the same attachment
+    downloaded for several tasks is only parsed by openpyxl once. Cached sheets are
+    read back memory-mapped, which is near instant compared to pd.read_excel.
+    Sheets are parsed with the read_excel defaults, so the first row of every sheet
+    becomes the column names.
+    """
+    def __init__(self, directory_name: str = "downloads/.cache"):
+        self.directory_name = directory_name
+        self._hashes: dict[tuple, str] = {}
+        os.makedirs(self.directory_name, exist_ok=True)
+
+    def _content_hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def _entry_dir(self, content_hash: str) -> str:
+        return os.path.join(self.directory_name, content_hash)
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        """Arrow needs string column names and single-typed columns."""
+        df = df.reset_index(drop=True)
+        df.columns = [str(column) for column in df.columns]
+        for column in df.columns:
+            if df[column].dtype == object:
+                try:
+                    pa.array(df[column])
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # Mixed types in one column, keep values readable as text
+                    df[column] = df[column].map(lambda v: None if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    def convert(self, file_path: str) -> dict[str, str]:
+        """
+        Convert a workbook into the cache, unless it is already there.
+
+        Args:
+            file_path (str): Local path of the spreadsheet attachment.
+
+        Returns:
+            dict[str, str]: Sheet name to cached feather file path.
+        """
+        content_hash = self._content_hash(file_path)
+        entry_dir = self._entry_dir(content_hash)
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        # The manifest is only written once an entry is complete, hits need no lock
+        if os.path.exists(manifest_path):
+            return self._read_manifest(manifest_path)
+        with _convert_lock(content_hash):
+            if os.path.exists(manifest_path):
+                return self._read_manifest(manifest_path)
+            os.makedirs(entry_dir, exist_ok=True)
+            sheets = pd.read_excel(file_path, sheet_name=None)
+            manifest = {}
+            for index, (sheet_name, df) in enumerate(sheets.items()):
+                sheet_path = os.path.join(entry_dir, f"sheet_{index}.feather")
+                # Uncompressed so the file can be memory-mapped on load
+                feather.write_feather(self._to_table(df), sheet_path,
+                                      compression="uncompressed")
+                manifest[sheet_name] = sheet_path
+            # The manifest is written last, it marks the entry complete
+            tmp_path = f"{manifest_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=4)
+            os.replace(tmp_path, manifest_path)
+            logger.info(f"Cached {len(manifest)} sheet(s) of {file_path} in {entry_dir}")
+            return manifest
+
+    def _read_manifest(self, manifest_path: str) -> dict[str, str]:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    def load(self, file_path: str, sheet_name: str | None = None, as_arrow: bool = False):
+        """
+        Load a workbook from the cache, converting it first if needed.
+
+        Args:
+            file_path (str): Local path of the spreadsheet attachment.
+            sheet_name (str, optional): Only load this sheet. Defaults to all sheets.
+            as_arrow (bool): Return the memory-mapped Arrow tables, without any copy.
+
+        Returns:
+            pd.DataFrame | pa.Table | dict: One sheet, or all sheets by name.
+        """
+        manifest = self.convert(file_path)
+        if sheet_name is not None:
+            if sheet_name not in manifest:
+                raise KeyError(f"Sheet '{sheet_name}' not found, available: {list(manifest)}")
+            return self._read(manifest[sheet_name], as_arrow)
+        return {name: self._read(path, as_arrow) for name, path in manifest.items()}
+
+    def _read(self, sheet_path: str, as_arrow: bool = False) -> pd.DataFrame | pa.Table:
+        table = feather.read_table(sheet_path, memory_map=True)
+        if as_arrow:
+            return table
+        # One block per column, so null-free numeric columns can stay on the mapped
+        # pages instead of being consolidated into a copy, strings are still copied
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def benchmark(file_path: str, repeat: int = 5) -> dict[str, float]:
+    """
+    Compare pd.read_excel against cold and warm cache loads of the same workbook.
+
+    Returns:
+        dict[str, float]: Mean seconds per load for each method.
+    """
+    import tempfile
+    results = {}
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        pd.read_excel(file_path, sheet_name=None)
+    results["read_excel"] = (time.perf_counter() - start_time) / repeat
+
+    with tempfile.TemporaryDirectory() as directory_name:
+        cache = SpreadsheetCache(directory_name)
+        start_time = time.perf_counter()
+        cache.load(file_path)
+        results["cache_cold"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            cache.load(file_path)
+        results["cache_warm"] = (time.perf_counter() - start_time) / repeat
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for path in sys.argv[1:]:
+        timings = benchmark(path)
+        speedup = timings["read_excel"] / max(timings["cache_warm"], 1e-9)
+        print(f"{path}: read_excel {timings['read_excel']*1000:.1f} ms, "
+              f"cache cold {timings['cache_cold']*1000:.1f} ms, "
+              f"cache warm {timings['cache_warm']*1000:.1f} ms ({speedup:.0f}x)")
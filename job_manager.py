@@ -0,0 +1,261 @@
+from settings import Settings
+from models import Question, QuestionAnswerPair
+from runner import Runner, AGENT_ERROR_PREFIX
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from typing import Optional
+import pandas as pd
+import threading
+import time
+import uuid
+import logging
+logger = logging.getLogger(__name__)
+
+
+class JobStatus():
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+
+class Job():
+    """One user's request to answer a list of questions."""
+    def __init__(self, username: str, questions: list[Question]):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.username = username
+        self.questions = questions
+        self.status = JobStatus.QUEUED
+        self.pairs: dict[str, QuestionAnswerPair] = {}
+        # Profiler run per task the job started or joined, reused answers have none
+        self.run_ids: dict[str, str] = {}
+        self.reused: set[str] = set()
+        self.results: Optional[pd.DataFrame] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        self.done = threading.Event()
+
+    def is_active(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def partial_results(self) -> pd.DataFrame:
+        """Answers received so far, in question order."""
+        pairs = [self.pairs[q.task_id] for q in self.questions if q.task_id in self.pairs]
+        return pd.DataFrame([pair.model_dump() for pair in pairs],
+                            columns=['task_id', 'question', 'answer'])
+
+    def summary(self) -> str:
+        now = self.finished_at or time.time()
+        waited = (self.started_at or now) - self.created_at
+        return (f"Job {self.job_id} {self.status}: "
+                f"{len(self.pairs)}/{len(self.questions)} answered, "
+                f"queued {waited:.0f}s, total {now - self.created_at:.0f}s")
+
+
+class SharedAnswer():
+    """A successful answer, and the users who already received it."""
+    def __init__(self, pair: QuestionAnswerPair, usernames: set[str]):
+        self.pair = pair
+        self.solved_at = time.time()
+        self.usernames = usernames
+
+
+class JobManager():
+    """
+    Queues agent runs per user and shares question work across users.
+
+    Each user runs one job at a time, later jobs wait in that user's queue.
+    Questions are solved on a shared pool bounded by max_concurrent_tasks, so
+    provider quotas are not multiplied by the number of users. A task_id that is
+    already being solved for someone else is joined rather than started again.
+    Successful answers are reused by other users' jobs for shared_answer_ttl seconds,
+    a user's own re-run always runs the agent again. Agent errors are never reused.
+    """
+    def __init__(self, settings: Settings, runner: Runner):
+        self.settings = settings
+        self.runner = runner
+        self._lock = threading.RLock()
+        self._task_pool = ThreadPoolExecutor(max_workers=settings.max_concurrent_tasks,
+                                             thread_name_prefix="task")
+        self._jobs: dict[str, Job] = {}
+        self._user_queues: dict[str, deque[Job]] = {}
+        self._inflight: dict[str, Future] = {}
+        self._inflight_run_ids: dict[str, str] = {}
+        self._waiters: dict[str, set[str]] = {}
+        self._solved: dict[str, SharedAnswer] = {}
+
+    def submit(self, username: str, questions: list[Question]) -> Job:
+        """Queue a job for the user, starting the user's worker if it is idle."""
+        job = Job(username, questions)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            queue = self._user_queues.setdefault(username, deque())
+            queue.append(job)
+            start_worker = len(queue) == 1
+        logger.info(f"Queued job {job.job_id} for {username} with {len(questions)} question(s)")
+        if start_worker:
+            threading.Thread(target=self._run_user_queue, args=(username,),
+                             name=f"jobs-{username}", daemon=True).start()
+        return job
+
+    def cancel(self, username: str) -> str:
+        """Cancel the user's running and queued jobs."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values()
+                    if job.username == username and job.is_active()]
+            for job in jobs:
+                job.cancel_requested.set()
+        if not jobs:
+            return "No active jobs to cancel."
+        return (f"Cancelling {len(jobs)} job(s): {', '.join(job.job_id for job in jobs)}. "
+                f"Queued questions are dropped, running ones stop at their next agent step "
+                f"unless another user is waiting for them.")
+
+    def status(self, username: str) -> str:
+        """Describe the user's jobs and the shared task pool."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.username == username]
+            inflight = len(self._inflight)
+        lines = [job.summary() for job in sorted(jobs, key=lambda job: job.created_at)]
+        lines.append(f"Questions in flight for all users: {inflight}")
+        return "\n".join(lines)
+
+    def timeline_html(self, username: str) -> str:
+        """Timeline of the user's most recent job."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.username == username]
+        if not jobs:
+            return "<p>No jobs yet.</p>"
+        job = max(jobs, key=lambda job: job.created_at)
+        timeline = self.runner.profiler.timeline(list(job.run_ids.values()))
+        html = timeline.render_html()
+        if job.reused:
+            html += f"<p>{len(job.reused)} answer(s) reused from another user's recent run, not shown.</p>"
+        return html
+
+    def _run_user_queue(self, username: str):
+        """Worker loop, runs the user's jobs one after the other."""
+        while True:
+            with self._lock:
+                queue = self._user_queues[username]
+                job = queue[0]
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+            with self._lock:
+                queue.popleft()
+                self._prune_jobs(username)
+                if not queue:
+                    return
+
+    def _prune_jobs(self, username: str):
+        """Keep only the user's most recent finished jobs, and drop expired answers."""
+        finished = sorted((job for job in self._jobs.values()
+                           if job.username == username and job.done.is_set()),
+                          key=lambda job: job.created_at)
+        for job in finished[:-self.settings.job_history]:
+            del self._jobs[job.job_id]
+        now = time.time()
+        for task_id in [task_id for task_id, shared in self._solved.items()
+                        if now - shared.solved_at > self.settings.shared_answer_ttl]:
+            del self._solved[task_id]
+
+    def _run_job(self, job: Job):
+        if job.cancel_requested.is_set():
+            job.status = JobStatus.CANCELLED
+            return
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        pending = {self._solve_shared(question, job): question.task_id
+                   for question in job.questions}
+        while pending:
+            if job.cancel_requested.is_set():
+                self._release(job, list(pending.values()))
+                job.status = JobStatus.CANCELLED
+                job.results = job.partial_results()
+                return
+            done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = pending.pop(future)
+                if not future.cancelled():
+                    job.pairs[task_id] = future.result()
+        self._release(job, [question.task_id for question in job.questions])
+        pairs = [job.pairs[q.task_id] for q in job.questions if q.task_id in job.pairs]
+        job.results = self.runner.save_results(pairs, job.username)
+        job.status = JobStatus.COMPLETED
+
+    def _solve_shared(self, question: Question, job: Job) -> Future:
+        """Return a future for the question, reusing cached or in-flight work."""
+        task_id = question.task_id
+        with self._lock:
+            shared = self._solved.get(task_id)
+            if shared and time.time() - shared.solved_at > self.settings.shared_answer_ttl:
+                del self._solved[task_id]
+            elif shared and job.username not in shared.usernames:
+                shared.usernames.add(job.username)
+                job.reused.add(task_id)
+                future = Future()
+                future.set_result(shared.pair)
+                return future
+            future = self._inflight.get(task_id)
+            if future is None or future.cancelled():
+                run_id = uuid.uuid4().hex[:12]
+                future = self._task_pool.submit(self.runner.solve, question, time.time(), run_id)
+                self._inflight[task_id] = future
+                self._inflight_run_ids[task_id] = run_id
+                job.run_ids[task_id] = run_id
+                self._waiters.setdefault(task_id, set()).add(job.job_id)
+                # Registered last, it runs at once if the task already finished
+                future.add_done_callback(
+                    lambda f, task_id=task_id: self._on_task_done(task_id, f))
+            else:
+                logger.info(f"Job {job.job_id} joins in-flight task {task_id}")
+                job.run_ids[task_id] = self._inflight_run_ids[task_id]
+                self._waiters.setdefault(task_id, set()).add(job.job_id)
+            return future
+
+    def _on_task_done(self, task_id: str, future: Future):
+        with self._lock:
+            if self._inflight.get(task_id) is future:
+                del self._inflight[task_id]
+                del self._inflight_run_ids[task_id]
+            if future.cancelled() or future.exception() is not None:
+                return
+            pair = future.result()
+            if not pair.answer.startswith(AGENT_ERROR_PREFIX):
+                usernames = {self._jobs[job_id].username
+                             for job_id in self._waiters.get(task_id, set())
+                             if job_id in self._jobs}
+                self._solved[task_id] = SharedAnswer(pair, usernames)
+
+    def _release(self, job: Job, task_ids: list[str]):
+        """Drop the job's interest in tasks, stopping the ones nobody else needs."""
+        with self._lock:
+            for task_id in task_ids:
+                waiters = self._waiters.get(task_id)
+                if waiters is None:
+                    continue
+                waiters.discard(job.job_id)
+                if not waiters:
+                    del self._waiters[task_id]
+                    future = self._inflight.get(task_id)
+                    if future is None or future.done():
+                        continue
+                    if future.cancel():
+                        logger.info(f"Cancelled queued task {task_id}")
+                    else:
+                        # Already running, its agents stop at their next step
+                        logger.info(f"Interrupting running task {task_id}")
+                        self.runner.interrupt(self._inflight_run_ids.pop(task_id))
+                        # Later jobs start a fresh run instead of joining the stopped one
+                        del self._inflight[task_id]
@@ -1,5 +1,5 @@
 # from enum import StrEnum
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class GoogleModelID():
@@ -15,10 +15,12 @@ class OpenRouterModelID():
   GROK_3_BETA = "openrouter/x-ai/grok-3-beta"
   
 class Question(BaseModel):
-    model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
+    model_config = ConfigDict(validate_by_name=True, validate_by_alias=True,
+                              coerce_numbers_to_str=True)
     task_id: str
     question: str
     file_name: str
+    level: str = Field(default="", alias="Level")
 
 class Answer(BaseModel):
     task_id: str
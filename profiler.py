@@ -0,0 +1,304 @@
+from pydantic import BaseModel
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import deque
+from typing import Optional
+import functools
+import html
+import os
+import sys
+import threading
+import time
+import uuid
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Span kinds, drawn in this lane order
+KINDS = ["task", "agent", "step", "llm", "tool"]
+COLORS = {"queue": "#c8c8c8", "task": "#4c78a8", "agent": "#72b7b2",
+          "step": "#54a24b", "llm": "#e45756", "tool": "#f58518"}
+_current_task: ContextVar[Optional[str]] = ContextVar("current_task", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+_current_run: ContextVar[Optional[str]] = ContextVar("current_run", default=None)
+
+
+def current_task_id() -> Optional[str]:
+    """The task_id of the task running in this context, if any."""
+    return _current_task.get()
+
+
+class Span(BaseModel):
+    span_id: str
+    parent_id: Optional[str] = None
+    run_id: Optional[str] = None
+    task_id: Optional[str] = None
+    kind: str
+    name: str
+    start: float
+    end: float
+    thread: str = ""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Profiler():
+    """
+    Records timestamped spans per task, agent, step, LLM call and tool call.
+
+    Every execution of a task is a run with its own run_id, so repeated runs of the
+    same task are never merged. The most recent spans are kept in memory, all spans
+    are appended to a local jsonl file, so a run can be rendered later with
+    'python profiler.py <file.jsonl>' without any service.
+    """
+    def __init__(self, directory_name: str = "profiles", max_spans: int = 100000):
+        self.directory_name = directory_name
+        os.makedirs(self.directory_name, exist_ok=True)
+        self.file_name = os.path.join(
+            self.directory_name, f"spans_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self._lock = threading.Lock()
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    def record(self, kind: str, name: str, start: float, end: float,
+               task_id: Optional[str] = None, parent_id: Optional[str] = None,
+               span_id: Optional[str] = None) -> Span:
+        span = Span(span_id=span_id or uuid.uuid4().hex[:12],
+                    parent_id=parent_id if parent_id is not None else _current_span.get(),
+                    run_id=_current_run.get(),
+                    task_id=task_id or _current_task.get(),
+                    kind=kind, name=name, start=start, end=end,
+                    thread=threading.current_thread().name)
+        with self._lock:
+            self._spans.append(span)
+            with open(self.file_name, "a") as f:
+                f.write(span.model_dump_json() + "\n")
+        return span
+
+    @contextmanager
+    def span(self, kind: str, name: str):
+        """Time the enclosed block as a child of the current span."""
+        span_id = uuid.uuid4().hex[:12]
+        parent_id = _current_span.get()
+        token = _current_span.set(span_id)
+        start = time.time()
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+            self.record(kind, name, start, time.time(),
+                        parent_id=parent_id, span_id=span_id)
+
+    @contextmanager
+    def task(self, task_id: str, queued_at: Optional[float] = None, run_id: Optional[str] = None):
+        """Time one run of a task, and the time it waited for a worker if queued_at is given."""
+        run_token = _current_run.set(run_id or uuid.uuid4().hex[:12])
+        task_token = _current_task.set(task_id)
+        span_token = _current_span.set(None)
+        if queued_at is not None:
+            self.record("queue", "waiting for worker", queued_at, time.time())
+        try:
+            with self.span("task", task_id):
+                yield
+        finally:
+            _current_span.reset(span_token)
+            _current_task.reset(task_token)
+            _current_run.reset(run_token)
+
+    def instrument_agent(self, agent):
+        """Wrap a smolagents agent's model, tools, steps and managed agents."""
+        agent.model = ProfiledModel(agent.model, self)
+        for tool in agent.tools.values():
+            self._wrap(tool, "forward", "tool", tool.name)
+        agent_name = agent.name or "manager"
+        agent.step_callbacks.append(lambda step: self._on_step(step, agent_name))
+        for managed_agent in agent.managed_agents.values():
+            self._wrap(managed_agent, "run", "agent", managed_agent.name)
+            self.instrument_agent(managed_agent)
+        return agent
+
+    def _wrap(self, target, attribute: str, kind: str, name: str):
+        # Instance attributes shadow the class method, the class is untouched
+        method = getattr(target, attribute)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.span(kind, name):
+                return method(*args, **kwargs)
+        setattr(target, attribute, wrapper)
+
+    def _on_step(self, step, agent_name: str):
+        start, end = getattr(step, "start_time", None), getattr(step, "end_time", None)
+        if start is None or end is None:
+            return
+        self.record("step", f"{agent_name} step {getattr(step, 'step_number', '')}".strip(),
+                    start, end)
+
+    def timeline(self, run_ids: Optional[list[str]] = None) -> "Timeline":
+        """Timeline of the given runs, or of every span still in memory."""
+        with self._lock:
+            spans = list(self._spans)
+        if run_ids is not None:
+            wanted = set(run_ids)
+            spans = [span for span in spans if span.run_id in wanted]
+        return Timeline(spans)
+
+
+class ProfiledModel():
+    """Proxy that times every call of a smolagents model."""
+    def __init__(self, model, profiler: Profiler):
+        self._model = model
+        self._profiler = profiler
+
+    def __call__(self, *args, **kwargs):
+        with self._profiler.span("llm", getattr(self._model, "model_id", "model")):
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class Timeline():
+    """Gantt rendering and critical path analysis of recorded spans."""
+    def __init__(self, spans: list[Span]):
+        self.spans = sorted(spans, key=lambda span: span.start)
+        self.tasks: dict[str, list[Span]] = {}
+        for span in self.spans:
+            self.tasks.setdefault(span.task_id or "-", []).append(span)
+
+    @classmethod
+    def load(cls, file_name: str) -> "Timeline":
+        with open(file_name, "r") as f:
+            return cls([Span.model_validate_json(line) for line in f if line.strip()])
+
+    @property
+    def start(self) -> float:
+        return min(span.start for span in self.spans)
+
+    @property
+    def end(self) -> float:
+        return max(span.end for span in self.spans)
+
+    def _busy(self, spans: list[Span], kind: str) -> float:
+        """Wall time covered by spans of a kind, overlaps counted once."""
+        total, covered_until = 0.0, float("-inf")
+        for span in sorted((s for s in spans if s.kind == kind), key=lambda s: s.start):
+            start = max(span.start, covered_until)
+            if span.end > start:
+                total += span.end - start
+                covered_until = span.end
+        return total
+
+    def task_summary(self, task_id: str) -> dict[str, float]:
+        spans = self.tasks[task_id]
+        summary = {kind: self._busy(spans, kind) for kind in ["queue"] + KINDS}
+        summary["other"] = max(summary["task"] - summary["llm"] - summary["tool"], 0.0)
+        return summary
+
+    def critical_path(self) -> tuple[str, list[tuple[Span, list[Span]]]]:
+        """
+        The task that finished last bounds the run. Its queueing and manager steps
+        are the critical path, each step with the calls made during it.
+        """
+        task_id = max(self.tasks, key=lambda task_id: max(s.end for s in self.tasks[task_id]))
+        spans = self.tasks[task_id]
+        task_span_ids = {span.span_id for span in spans if span.kind == "task"}
+        children = [span for span in spans if span.parent_id in task_span_ids]
+        steps = [span for span in children if span.kind == "step"] or children
+        path = [(span, []) for span in spans if span.kind == "queue"]
+        for step in steps:
+            calls = [span for span in children if span.kind != "step"
+                     and span.start >= step.start and span.end <= step.end]
+            path.append((step, calls))
+        return task_id, sorted(path, key=lambda item: item[0].start)
+
+    def render_text(self, width: int = 60) -> str:
+        if not self.spans:
+            return "No spans recorded."
+        start, total = self.start, max(self.end - self.start, 1e-9)
+
+        def column(t: float) -> int:
+            return min(int((t - start) / total * width), width - 1)
+
+        # Later kinds paint over earlier ones, so LLM and tool time stays visible
+        marks = {"queue": ".", "task": "-", "step": "=", "llm": "L", "tool": "T"}
+        lines = [f"Timeline {total:.1f}s, {len(self.tasks)} task(s). "
+                 f"Legend: . queue, - task, = step, L llm, T tool",
+                 f"{'task':10} |{'':{width}}| {'queue':>7} {'work':>7} {'llm':>7} {'tool':>7}"]
+        for task_id, spans in self.tasks.items():
+            bar = [" "] * width
+            for kind, mark in marks.items():
+                for span in spans:
+                    if span.kind == kind:
+                        for i in range(column(span.start), column(span.end) + 1):
+                            bar[i] = mark
+            summary = self.task_summary(task_id)
+            lines.append(f"{task_id[:10]:10} |{''.join(bar)}| {summary['queue']:6.1f}s "
+                         f"{summary['task']:6.1f}s {summary['llm']:6.1f}s {summary['tool']:6.1f}s")
+
+        queue_total = sum(self.task_summary(task_id)["queue"] for task_id in self.tasks)
+        work_total = sum(self.task_summary(task_id)["task"] for task_id in self.tasks)
+        lines.append(f"Queueing delay {queue_total:.1f}s vs work time {work_total:.1f}s "
+                     f"summed over tasks.")
+        task_id, path = self.critical_path()
+        lines.append(f"Critical path: task {task_id}, ending at {self.end - start:.1f}s")
+        for span, calls in path:
+            lines.append(f"  {span.start - start:7.1f}s +{span.duration:6.1f}s "
+                         f"{span.kind:6} {span.name}")
+            for call in calls:
+                lines.append(f"    {call.start - start:7.1f}s +{call.duration:6.1f}s "
+                             f"{call.kind:6} {call.name}")
+        return "\n".join(lines)
+
+    def render_html(self) -> str:
+        if not self.spans:
+            return "<p>No spans recorded.</p>"
+        start, total = self.start, max(self.end - self.start, 1e-9)
+        rows = []
+        for task_id, spans in self.tasks.items():
+            lanes = []
+            for kind in KINDS:
+                bars = []
+                for span in spans:
+                    # Queueing is drawn in the task lane, before the work starts
+                    if span.kind != kind and not (kind == "task" and span.kind == "queue"):
+                        continue
+                    left = (span.start - start) / total * 100
+                    bar_width = max(span.duration / total * 100, 0.2)
+                    title = html.escape(f"{span.kind} {span.name}: {span.duration:.2f}s "
+                                        f"at +{span.start - start:.2f}s")
+                    bars.append(f'<div title="{title}" style="position:absolute;left:{left:.3f}%;'
+                                f'width:{bar_width:.3f}%;height:100%;'
+                                f'background:{COLORS[span.kind]};opacity:0.85"></div>')
+                if bars:
+                    lanes.append(f'<div style="position:relative;height:12px;margin:1px 0">'
+                                 f'{"".join(bars)}</div>')
+            summary = self.task_summary(task_id)
+            rows.append(f'<tr><td style="font-family:monospace;vertical-align:top">'
+                        f'{html.escape(task_id[:10])}<br><small>queue {summary["queue"]:.1f}s, '
+                        f'work {summary["task"]:.1f}s</small></td>'
+                        f'<td style="width:100%">{"".join(lanes)}</td></tr>')
+
+        task_id, path = self.critical_path()
+        path_rows = "".join(
+            f"<li>+{span.start - start:.1f}s {span.kind} {html.escape(span.name)} "
+            f"({span.duration:.1f}s)<ul>"
+            + "".join(f"<li>{call.kind} {html.escape(call.name)} ({call.duration:.1f}s)</li>"
+                      for call in calls)
+            + "</ul></li>"
+            for span, calls in path)
+        legend = " ".join(f'<span style="background:{color};padding:0 6px">{kind}</span>'
+                          for kind, color in COLORS.items())
+        return (f"<div><p>Timeline {total:.1f}s, {len(self.tasks)} task(s). {legend}</p>"
+                f'<table style="width:100%;border-collapse:collapse">{"".join(rows)}</table>'
+                f"<p>Critical path: task {html.escape(task_id)}</p><ol>{path_rows}</ol></div>")
+
+
+if __name__ == "__main__":
+    # python profiler.py profiles/spans_<time>.jsonl [timeline.html]
+    timeline = Timeline.load(sys.argv[1])
+    print(timeline.render_text())
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as f:
+            f.write(timeline.render_html())
@@ -0,0 +1,143 @@
+from settings import Settings
+from models import Question
+from typing import Optional
+import requests
+import threading
+import tempfile
+import time
+import json
+import os
+import logging
+logger = logging.getLogger(__name__)
+
+
+class QuestionStore():
+    """
+    Local, indexed copy of the scoring API questions.
+
+    Questions are kept in memory, indexed by task_id and level, and mirrored to
+    questions.json. The remote list is only re-validated once the TTL expires,
+    using the ETag of the last response so an unchanged list costs a 304.
+    """
+    def __init__(self, settings: Settings, file_name: str = "questions.json"):
+        self.settings = settings
+        self.file_name = file_name
+        self.meta_file_name = f"{os.path.splitext(file_name)[0]}.meta.json"
+        self._lock = threading.Lock()
+        self._questions: list[Question] = []
+        self._by_task_id: dict[str, Question] = {}
+        self._by_level: dict[str, list[Question]] = {}
+        self._etag: Optional[str] = None
+        self._fetched_at = 0.0
+        self._next_attempt_at = 0.0
+        self._load_local()
+
+    def _index(self, questions: list[Question]):
+        """Rebuild the in-memory indexes."""
+        by_level = {}
+        for question in questions:
+            by_level.setdefault(question.level, []).append(question)
+        self._questions = questions
+        self._by_task_id = {question.task_id: question for question in questions}
+        self._by_level = by_level
+
+    def _load_local(self):
+        """Seed the store from disk, if a previous copy exists."""
+        try:
+            with open(self.file_name, "r") as f:
+                self._index([Question(**question) for question in json.load(f)])
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.warning(f"No usable local questions in {self.file_name}: {e}")
+            return
+        try:
+            with open(self.meta_file_name, "r") as f:
+                meta = json.load(f)
+            self._etag = meta.get("etag")
+            self._fetched_at = float(meta.get("fetched_at", 0.0))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _write_atomic(self, file_name: str, data):
+        """Write json to a temp file in the same directory, then swap it in."""
+        directory = os.path.dirname(os.path.abspath(file_name))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, file_name)
+        except:
+            os.remove(tmp_path)
+            raise
+
+    def _is_stale(self) -> bool:
+        return not self._questions or \
+            time.time() - self._fetched_at > self.settings.questions_cache_ttl
+
+    def _should_refresh(self, force: bool) -> bool:
+        # Any attempt, failed or not, backs off further ones, even forced ones
+        if time.time() < self._next_attempt_at:
+            return False
+        return force or self._is_stale()
+
+    def refresh(self, force: bool = False):
+        """
+        Re-validate the local copy against the HuggingFace endpoint.
+
+        Args:
+            force (bool): Ignore the TTL, but not the retry backoff, and ask the endpoint now.
+        """
+        if not self._should_refresh(force):
+            if not self._questions:
+                raise RuntimeError("No local questions and the scoring API is backing off.")
+            return
+        if self._questions:
+            # Serve the local copy while another caller is refreshing it
+            if not self._lock.acquire(blocking=False):
+                return
+        else:
+            self._lock.acquire()
+        try:
+            if not self._should_refresh(force):
+                return
+            self._next_attempt_at = time.time() + self.settings.questions_retry_backoff
+            url = str(self.settings.scoring_api_base_url) + "questions"
+            headers = {"If-None-Match": self._etag} if self._etag and self._questions else {}
+            try:
+                response = requests.get(url, headers=headers, timeout=10)
+                if response.status_code == 304:
+                    logger.debug("Questions not modified, keeping local copy.")
+                else:
+                    response.raise_for_status()
+                    questions = [Question(**question) for question in response.json()]
+                    self._index(questions)
+                    self._etag = response.headers.get("ETag")
+                    self._write_atomic(self.file_name,
+                                       [question.model_dump() for question in questions])
+                    logger.info(f"Fetched {len(questions)} questions from {url}")
+                self._fetched_at = time.time()
+                self._write_atomic(self.meta_file_name,
+                                   {"etag": self._etag, "fetched_at": self._fetched_at})
+            except Exception as e:
+                # Keep serving the local copy, dealing with rate limits, etc.
+                logger.warning(f"Could not refresh questions, using local copy: {e}")
+                if not self._questions:
+                    raise
+        finally:
+            self._lock.release()
+
+    def all(self, level: Optional[str] = None) -> list[Question]:
+        """Return all questions, optionally only those of one level."""
+        self.refresh()
+        if level is None:
+            return list(self._questions)
+        return list(self._by_level.get(str(level), []))
+
+    def get(self, task_id: str) -> Optional[Question]:
+        """Return the question for a task_id, or None if it is unknown."""
+        self.refresh()
+        question = self._by_task_id.get(task_id)
+        if question is None:
+            # An unknown id may be a new question, so skip the TTL once.
+            self.refresh(force=True)
+            question = self._by_task_id.get(task_id)
+        return question
@@ -1,17 +1,28 @@
 from settings import Settings
 from models import Question, QuestionAnswerPair
 from agent import ManagerAgent
+from answer_format import AnswerFormat, FormatStats
+from profiler import Profiler
+from blob_store import BlobStore
+from speculative import SpeculationStats
 import pandas as pd
 import logging
 import json
-import asyncio
-import nest_asyncio
-nest_asyncio.apply()
+import threading
 logger = logging.getLogger(__name__)
+AGENT_ERROR_PREFIX = "AGENT ERROR:"
 
 class Runner():
     def __init__(self, settings: Settings):
         self.settings = settings
+        self.format_stats = FormatStats()
+        self.profiler = Profiler(settings.profile_dir, settings.profile_max_spans)
+        self.blob_store = BlobStore(settings.blob_dir, settings.blob_threshold)
+        self.speculation_stats = SpeculationStats()
+        self._lock = threading.Lock()
+        # Agents by run_id while they run, and runs interrupted before their agent existed
+        self._agents: dict[str, ManagerAgent] = {}
+        self._interrupted: set[str] = set()
 
     def _save_pairs(self, pairs: list[QuestionAnswerPair], username: str):
         """Write the question answer pairs to a user-specific file."""
@@ -28,52 +39,79 @@ class Runner():
             "Think hard to answer. Parse all statements in the question to make a plan. "
             "Your final answer should be a number or as few words as possible. "
             "Only use abbreviations when the question calls for abbreviations. "
-            "If needed, use a comma separated list of values; the comma is always followed by a space. "
-            f"Critically review your answer before making it the final answer. "
-            f"Double check the answer to make sure it meets all format requirements stated in the question. "
             f"task_id: {task_id}."
         )
         if file_name:
             question_text = f"{question_text} file_name: {file_name} (use tools to fetch the file)"
         return question_text
 
-    async def _run_agent_async(self, item: Question):
-        """Runs the agent asynchronously."""
+    def solve(self, item: Question, queued_at: float | None = None,
+              run_id: str | None = None) -> QuestionAnswerPair:
+        """Runs the agent on one question, blocking until it answers."""
         task_id = item.task_id
         question_text = self._enrich_question_text(item)
-        try:
-            answer = await asyncio.to_thread(ManagerAgent(self.settings), question_text)
-        except Exception as e:
-            logger.error(f"Error running agent on task {task_id}: {e}")
-            answer = f"AGENT ERROR: {e}"
+        with self.profiler.task(task_id, queued_at, run_id):
+            try:
+                agent = ManagerAgent(self.settings, self.profiler, self.blob_store,
+                                     self.speculation_stats)
+                if run_id is not None:
+                    with self._lock:
+                        self._agents[run_id] = agent
+                        if run_id in self._interrupted:
+                            agent.interrupt()
+                answer = self._format_answer(agent, item, str(agent(question_text)))
+            except Exception as e:
+                logger.error(f"Error running agent on task {task_id}: {e}")
+                answer = f"{AGENT_ERROR_PREFIX} {e}"
+            finally:
+                with self._lock:
+                    self._agents.pop(run_id, None)
+                    self._interrupted.discard(run_id)
+        logger.info(self.blob_store.task_report(task_id))
         return QuestionAnswerPair(task_id=task_id,
                                   question=item.question, answer=str(answer))
 
-    def _assign_questions(self, questions: list[Question]):
-        """Runs the asynchronous loop and returns task outputs."""
-        tasks = [self._run_agent_async(item) for item in questions]
-        return asyncio.gather(*tasks)
+    def interrupt(self, run_id: str):
+        """Stop a running solve() at its agents' next step."""
+        with self._lock:
+            agent = self._agents.get(run_id)
+            if agent is None:
+                self._interrupted.add(run_id)
+                return
+        agent.interrupt()
 
-    def run_agent(self, questions: list[Question], username: str) -> pd.DataFrame:
-        """Run the agent(s) async, save answers and return a dataframe"""
-        # Assign questions to agents and wait
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:  # No running loop, create one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-        def run_tasks_in_thread():
-            question_answer_pairs = loop.run_until_complete(
-                self._assign_questions(questions))
-            return question_answer_pairs
-
-        pairs = run_tasks_in_thread()
+    def _format_answer(self, agent: ManagerAgent, item: Question, answer: str) -> str:
+        """Normalize the answer locally, only asking the agent again if it is invalid."""
+        answer_format = AnswerFormat.from_question(item.question)
+        normalized = answer_format.normalize(answer)
+        problems = answer_format.validate(normalized)
+        answer_steps = agent.step_count()
+        reprompt_steps = 0
+        if problems:
+            logger.info(f"Answer for task {item.task_id} failed validation: {problems}")
+            try:
+                answer = str(agent.follow_up(
+                    f"Your final answer '{normalized}' does not meet the format requirements: "
+                    f"{' '.join(problems)} Provide the corrected final answer."))
+                normalized = answer_format.normalize(answer)
+                problems = answer_format.validate(normalized)
+            except Exception as e:
+                # Keep the first answer, a failed re-prompt must not turn it into an error
+                logger.error(f"Re-prompt failed for task {item.task_id}, keeping first answer: {e}")
+            reprompt_steps = agent.step_count() - answer_steps
+        self.format_stats.record(changed=normalized != answer.strip(), answer_steps=answer_steps,
+                                 reprompt_steps=reprompt_steps, failed=bool(problems))
+        return normalized
 
+    def save_results(self, pairs: list[QuestionAnswerPair], username: str) -> pd.DataFrame:
+        """Save answers for the user and return a dataframe"""
         # save json to disk and return a dataframe
         self._save_pairs(pairs, username)
         results_log = [pair.model_dump() for pair in pairs if pair is not None]
         if not results_log:
             logger.warning("Agent did not produce any answers to submit.")
+        logger.info(self.format_stats.report())
+        if self.settings.speculative_execution:
+            logger.info(self.speculation_stats.report())
 
         return pd.DataFrame(results_log)
@@ -12,16 +12,29 @@ class Settings(BaseSettings):
     scoring_api_base_url: HttpUrl = HttpUrl(
         "https://agents-course-unit4-scoring.hf.space"
     )
+    blob_dir: str = "blobs"
+    blob_threshold: int = 8000
     chess_eval_url: HttpUrl = HttpUrl(
         "https://stockfish.online/api/s/v2.php"
     )
     gemini_api_key: SecretStr
     langfuse_public_key: SecretStr
     langfuse_secret_key: SecretStr
+    job_history: int = 10
+    max_concurrent_tasks: int = 8
     openrouter_api_key: SecretStr
     otel_exporter_otlp_endpoint: HttpUrl
     serper_api_key: SecretStr
+    profile_dir: str = "profiles"
+    profile_max_spans: int = 100000
+    questions_cache_ttl: int = 3600
+    questions_retry_backoff: int = 60
+    shared_answer_ttl: int = 900
     space_id: str
+    speculative_agreement: int = 1
+    speculative_deadline: int = 300
+    speculative_execution: bool = False
+    speculative_max_candidates: int = 3
     username: str
     
     def set_langfuse_auth(self):
@@ -0,0 +1,216 @@
+from settings import Settings
+from answer_format import AnswerFormat
+from profiler import Profiler
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter
+from typing import Callable, Optional
+from smolagents import Tool
+import contextvars
+import threading
+import time
+import logging
+logger = logging.getLogger(__name__)
+
+
+class SpeculationStats():
+    """
+    Latency of racing candidate sub-agent runs and the extra tokens they cost.
+
+    The baseline tries the approaches one after the other in the order given and
+    stops at the first non-empty answer. Interrupted runs only count their time until
+    the race ended, so the baseline is a lower bound. Losers' tokens are added when
+    their runs actually stop, which can be after the race.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.races = 0
+        self.wall_seconds = 0.0
+        self.serial_seconds = 0.0
+        self.winner_tokens = 0
+        self.extra_tokens = 0
+        self.running_losers = 0
+        self.unstarted = 0
+
+    def record(self, wall: float, serial: float, winner_tokens: int, losers: int, unstarted: int):
+        with self._lock:
+            self.races += 1
+            self.unstarted += unstarted
+            self.wall_seconds += wall
+            self.serial_seconds += serial
+            self.winner_tokens += winner_tokens
+            self.running_losers += losers
+
+    def record_loser(self, tokens: int):
+        with self._lock:
+            self.extra_tokens += tokens
+            self.running_losers -= 1
+
+    def report(self) -> str:
+        with self._lock:
+            return (f"Speculation: {self.races} race(s) took {self.wall_seconds:.0f}s, trying the "
+                    f"approaches one after the other would have taken at least "
+                    f"{self.serial_seconds:.0f}s. {self.extra_tokens} extra token(s) on top of "
+                    f"{self.winner_tokens} for the winners, {self.running_losers} losing run(s) "
+                    f"still stopping and not counted yet. {self.unstarted} candidate(s) never "
+                    f"got a worker before their race ended.")
+
+
+class Candidate():
+    """One speculative sub-agent run."""
+    def __init__(self, agent_name: str, approach: str, agent):
+        self.agent_name = agent_name
+        self.approach = approach
+        self.agent = agent
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.answered = False
+
+    def run(self, task: str) -> str:
+        # Set here, a candidate may wait for a free worker in the shared pool
+        self.started_at = time.time()
+        try:
+            return str(self.agent.run(f"{task}\nApproach: {self.approach}"))
+        finally:
+            self.finished_at = time.time()
+
+    def tokens(self) -> int:
+        monitor = self.agent.monitor
+        return monitor.total_input_token_count + monitor.total_output_token_count
+
+    def seconds(self, now: float) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or now) - self.started_at
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(settings: Settings) -> ThreadPoolExecutor:
+    """
+    The process wide pool for speculative runs, on top of max_concurrent_tasks. It fits
+    a full race for every concurrent task, so candidates start at once unless losers of
+    earlier races are still finishing their current step.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = settings.max_concurrent_tasks * settings.speculative_max_candidates
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        return _pool
+
+
+def serial_seconds(candidates: list[Candidate], now: float) -> float:
+    """Lower bound on trying the candidates in order, stopping at the first non-empty answer."""
+    total = 0.0
+    for candidate in candidates:
+        total += candidate.seconds(now)
+        # An unfinished run might still have answered, so stop counting there too
+        if candidate.answered or candidate.finished_at is None:
+            break
+    return total
+
+
+class SpeculativeDelegateTool(Tool):
+    name = "delegate_in_parallel"
+    description = """When unsure which approach will work, e.g. web research or analysing the attached file, \
+        run up to {max_candidates} alternative approaches of a team member at the same time. \
+        The first answer is returned and the other runs are stopped. \
+        Team members: {agent_names}."""
+    inputs = {
+        "task": {"type": "string", "description": "The task for the team member, with all needed details"},
+        "approaches": {"type": "array", "description": "Alternative approaches, each a short instruction"},
+        "agent_name": {"type": "string", "description": "The team member to run, defaults to researcher",
+                       "nullable": True},
+    }
+    output_type = "string"
+
+    def __init__(self, settings: Settings, agent_factories: dict[str, Callable],
+                 stats: SpeculationStats, profiler: Profiler | None = None):
+        self.description = self.description.format(
+            max_candidates=settings.speculative_max_candidates,
+            agent_names=", ".join(agent_factories))
+        super().__init__()
+        self.settings = settings
+        self.agent_factories = agent_factories
+        self.stats = stats
+        self.profiler = profiler
+
+    def _new_candidate(self, agent_name: str, approach: str) -> Candidate:
+        # Every candidate needs its own agent, memory can not be shared between runs
+        agent = self.agent_factories[agent_name]()
+        if self.profiler:
+            self.profiler.instrument_agent(agent)
+        return Candidate(agent_name, approach, agent)
+
+    def forward(self, task: str, approaches: list, agent_name: str | None = None) -> str:
+        agent_name = agent_name or "researcher"
+        if agent_name not in self.agent_factories:
+            return f"Unknown team member '{agent_name}', choose from {list(self.agent_factories)}."
+        approaches = [str(approach) for approach in approaches][:self.settings.speculative_max_candidates]
+        if not approaches:
+            approaches = ["Use your best judgement."]
+        answer_format = AnswerFormat.from_question(task)
+        candidates = [self._new_candidate(agent_name, approach) for approach in approaches]
+
+        start_time = time.time()
+        deadline = start_time + self.settings.speculative_deadline
+        pool = get_pool(self.settings)
+        # Copy the context so profiling spans keep their task_id in the pool threads
+        futures = {pool.submit(contextvars.copy_context().run, candidate.run, task): candidate
+                   for candidate in candidates}
+        pending = dict(futures)
+        # Only empty or failed runs are rejected, the final answer format is checked by the runner
+        finished: list[tuple[Candidate, str]] = []
+        answers: list[tuple[Candidate, str]] = []
+        winner: Optional[tuple[Candidate, str]] = None
+        while pending and winner is None and time.time() < deadline:
+            done, _ = wait(pending, timeout=deadline - time.time(), return_when=FIRST_COMPLETED)
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    logger.info(f"Speculative {candidate.agent_name} '{candidate.approach}' failed: {e}")
+                    continue
+                finished.append((candidate, answer))
+                if not answer.strip():
+                    continue
+                normalized = answer_format.normalize(answer)
+                candidate.answered = True
+                answers.append((candidate, answer))
+                agreeing = [item for item in answers
+                            if answer_format.normalize(item[1]).lower() == normalized.lower()]
+                if len(agreeing) >= self.settings.speculative_agreement:
+                    winner = (candidate, answer)
+                    break
+
+        # Losers stop at their next step, queued ones never start
+        for future, candidate in pending.items():
+            if not future.cancel():
+                candidate.agent.interrupt()
+        if winner is None and answers:
+            # Deadline or all runs finished without agreement, take the most common answer
+            counts = Counter(answer_format.normalize(answer).lower() for _, answer in answers)
+            winner = next(item for item in answers
+                          if answer_format.normalize(item[1]).lower() == counts.most_common(1)[0][0])
+        elif winner is None and finished:
+            winner = finished[0]
+
+        now = time.time()
+        wall = now - start_time
+        winner_tokens = winner[0].tokens() if winner else 0
+        losers = {future: candidate for future, candidate in futures.items()
+                  if winner is None or candidate is not winner[0]}
+        unstarted = sum(candidate.started_at is None for candidate in candidates)
+        self.stats.record(wall, serial_seconds(candidates, now), winner_tokens, len(losers), unstarted)
+        for future, candidate in losers.items():
+            # Runs immediately for finished runs, otherwise once the interrupt takes effect
+            future.add_done_callback(
+                lambda _, candidate=candidate: self.stats.record_loser(candidate.tokens()))
+        if winner is None:
+            return f"No approach produced an answer within {self.settings.speculative_deadline}s."
+        logger.info(f"Speculative winner: {winner[0].agent_name} '{winner[0].approach}' "
+                    f"after {wall:.0f}s, {len(losers)} losing run(s)")
+        return f"Answer from approach '{winner[0].approach}':\n{winner[1]}"
@@ -1,24 +1,37 @@
+import asyncio
 import os
 import json
 import logging
 logger = logging.getLogger(__name__)
 import re
-import requests
 import shutil
 from typing import Any
 import urllib.parse
 from board_to_fen.predict import get_fen_from_image_path
-from google import genai
 from google.genai import types
-from litellm import completion
+from litellm import acompletion
 from smolagents import Tool
 from settings import Settings
+from file_cache import SpreadsheetCache, SPREADSHEET_EXTENSIONS
+from async_runtime import get_runtime
+from blob_store import BlobStore
 
 
 class BaseCustomTool(Tool):
+    """
+    Tools doing network I/O may define aforward() to run it on the shared event loop,
+    forward() is the blocking entry point smolagents calls from agent steps.
+    """
     def __init__(self, settings):
         super().__init__()
         self.settings = settings
+        self.runtime = get_runtime()
+
+    def forward(self, *args, **kwargs):
+        aforward = getattr(self, "aforward", None)
+        if aforward is None:
+            raise NotImplementedError(f"{type(self).__name__} must define forward() or aforward()")
+        return self.runtime.run(aforward(*args, **kwargs))
         
 class GetTaskFileTool(BaseCustomTool):
     name = "get_task_file_tool"
@@ -33,18 +46,38 @@ class GetTaskFileTool(BaseCustomTool):
         super().__init__(settings)
         self.directory_name = "downloads"
         self.create_dir()
+        self.spreadsheet_cache = SpreadsheetCache()
         
     def forward(self, task_id: str, file_name: str) -> str:
+        return super().forward(task_id, file_name)
+
+    async def aforward(self, task_id: str, file_name: str) -> str:
         try:
-            response = requests.get(f"{self.settings.evaluation_api_base_url}/files/{task_id}", timeout=15)
+            response = await self.runtime.client.get(
+                f"{self.settings.evaluation_api_base_url}/files/{task_id}", timeout=15)
             response.raise_for_status()
-            with open(f"{self.directory_name}/{file_name}", 'wb') as file:
-                file.write(response.content)
-            return os.path.abspath(f"{self.directory_name}/{file_name}")
+            # Disk I/O and conversion block, keep them off the shared event loop
+            await asyncio.to_thread(self._write_file, file_name, response.content)
+            file_path = os.path.abspath(f"{self.directory_name}/{file_name}")
         except Exception as e:
             # Fetch the local file instead, dealing with rate limits, etc.
-            shutil.copy2(f"files/{file_name}", f"{self.directory_name}/{file_name}")
-            return f"{self.directory_name}/{file_name}"
+            await asyncio.to_thread(shutil.copy2, f"files/{file_name}",
+                                    f"{self.directory_name}/{file_name}")
+            file_path = f"{self.directory_name}/{file_name}"
+        await asyncio.to_thread(self._warm_spreadsheet_cache, file_path)
+        return file_path
+
+    def _write_file(self, file_name: str, content: bytes):
+        with open(f"{self.directory_name}/{file_name}", 'wb') as file:
+            file.write(content)
+
+    def _warm_spreadsheet_cache(self, file_path: str):
+        # Convert spreadsheets once on download, so agents never wait on openpyxl
+        if file_path.lower().endswith(SPREADSHEET_EXTENSIONS):
+            try:
+                self.spreadsheet_cache.convert(file_path)
+            except Exception as e:
+                logger.warning(f"Could not cache spreadsheet {file_path}: {e}")
         
     def create_dir(self):
         # Create the directory if it doesn't exist
@@ -54,6 +87,62 @@ class GetTaskFileTool(BaseCustomTool):
         else:
             logger.debug(f"Directory '{self.directory_name}' already exists.")
 
+class SpreadsheetTool(Tool):
+    name = "load_spreadsheet"
+    description = """Load an Excel file (.xlsx, .xlsm) as pandas DataFrames from a columnar cache. \
+        Much faster than pd.read_excel, use it instead. Returns a dict of sheet name to DataFrame, \
+        or a single DataFrame if sheet_name is given. Use vectorized pandas operations on the result. \
+        The first row of every sheet is always used as the column names, if it is a title instead, \
+        read the real header from the rows below, e.g. df.columns = df.iloc[0]; df = df.iloc[1:]. \
+        With as_arrow=True, pyarrow Tables are returned instead, memory-mapped without copying."""
+    inputs = {
+        "file_path": {"type": "string", "description": "The local file of the spreadsheet"},
+        "sheet_name": {"type": "string", "description": "Only load this sheet", "nullable": True},
+        "as_arrow": {"type": "boolean", "description": "Return pyarrow Tables instead of DataFrames",
+                     "nullable": True},
+    }
+    output_type = "object"
+
+    def __init__(self):
+        super().__init__()
+        self.cache = SpreadsheetCache()
+
+    def forward(self, file_path: str, sheet_name: str | None = None, as_arrow: bool | None = False):
+        return self.cache.load(file_path, sheet_name, bool(as_arrow))
+
+class ReadBlobTool(Tool):
+    name = "read_blob"
+    description = "Read part of a large tool output that was stored as a blob. Offsets are in bytes."
+    inputs = {
+        "blob_id": {"type": "string", "description": "The blob id from the tool output handle"},
+        "start": {"type": "integer", "description": "Byte offset to start reading at", "nullable": True},
+        "length": {"type": "integer", "description": "Number of bytes to read, at most 20000", "nullable": True},
+    }
+    output_type = "string"
+
+    def __init__(self, blob_store: BlobStore):
+        super().__init__()
+        self.blob_store = blob_store
+
+    def forward(self, blob_id: str, start: int | None = 0, length: int | None = 4000) -> str:
+        return self.blob_store.read(blob_id, start or 0, min(length or 4000, 20000))
+
+class GrepBlobTool(Tool):
+    name = "grep_blob"
+    description = "Search a large tool output that was stored as a blob with a regex (case insensitive). Returns matches with context and byte offsets."
+    inputs = {
+        "blob_id": {"type": "string", "description": "The blob id from the tool output handle"},
+        "pattern": {"type": "string", "description": "Regular expression to search for"},
+    }
+    output_type = "string"
+
+    def __init__(self, blob_store: BlobStore):
+        super().__init__()
+        self.blob_store = blob_store
+
+    def forward(self, blob_id: str, pattern: str) -> str:
+        return self.blob_store.grep(blob_id, pattern)
+
 class VideoUnderstandingTool(BaseCustomTool):
     name = "VideoUnderstanding"
     description = "Prompt a YouTube video with questions to understand its content."
@@ -68,9 +157,12 @@ class VideoUnderstandingTool(BaseCustomTool):
         self.model = model
         
     def forward(self, youtube_url: str, prompt: str) -> str:
-        client = genai.Client(api_key=self.settings.gemini_api_key.get_secret_value())
+        return super().forward(youtube_url, prompt)
+
+    async def aforward(self, youtube_url: str, prompt: str) -> str:
+        client = self.runtime.genai_client(self.settings.gemini_api_key.get_secret_value())
         try:
-            video_description = client.models.generate_content(
+            video_description = await client.aio.models.generate_content(
                 model=self.model,
                 contents=types.Content(
                     parts=[
@@ -100,10 +192,13 @@ class AudioUnderstandingTool(BaseCustomTool):
         self.model = model
 
     def forward(self, file_path: str, prompt: str) -> str:
-        client = genai.Client(api_key=self.settings.gemini_api_key.get_secret_value())
+        return super().forward(file_path, prompt)
+
+    async def aforward(self, file_path: str, prompt: str) -> str:
+        client = self.runtime.genai_client(self.settings.gemini_api_key.get_secret_value())
         try:
-            mp3_file = client.files.upload(file=f"{file_path}")
-            audio_description = client.models.generate_content(
+            mp3_file = await client.aio.files.upload(file=f"{file_path}")
+            audio_description = await client.aio.models.generate_content(
                 model=self.model,
                 contents=[prompt, mp3_file]
             )
@@ -126,13 +221,16 @@ class ConvertChessMoveTool(BaseCustomTool):
         self.model = model
 
     def forward(self, piece_placement: str, move: str) -> str:
+        return super().forward(piece_placement, move)
+
+    async def aforward(self, piece_placement: str, move: str) -> str:
         move_message = (
             f"Convert this chess move from coordinate notation to algebraic "
             f"notation: {move}. Use the following {piece_placement}. Do not provide any additional "
             "thinking or commentary in the response, the algebraic notation only."
             )
         messages = [{ "content": move_message, "role": "user"}]
-        response = completion(
+        response = await acompletion(
                     model=self.model, 
                     temperature=0.0,
                     messages=messages,
@@ -151,9 +249,12 @@ class BestChessMoveTool(BaseCustomTool):
     output_type = "string"
 
     def forward(self, fen: str) -> str:
+        return super().forward(fen)
+
+    async def aforward(self, fen: str) -> str:
         try:
             url = f"{self.settings.chess_eval_url}?fen={urllib.parse.quote(fen)}&depth=15"
-            response = requests.get(url, timeout=15)
+            response = await self.runtime.client.get(url, timeout=15)
             if response.status_code == 200 and json.loads(response.text)['success'] == True:
                 return json.loads(response.text)['bestmove'].split()[1]
             else: